@@ -68,6 +68,13 @@ def initialize_student_details():
         with open("student_details.json", 'w') as f:
             json.dump({}, f)
 
+def get_file_mtime(path):
+    """Get a file's modification time in nanoseconds, or None if it doesn't exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
 def generate_student_id(student_name, class_category):
     """Generate a unique 8-character ID based on student name and class"""
     unique_str = f"{student_name}_{class_category}".encode('utf-8')
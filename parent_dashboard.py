@@ -1,17 +1,53 @@
 #type:ignore
+import os
 import streamlit as st
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from parent_database import (
     get_student_fee_summary, 
-    get_payment_history, 
+    get_payment_history_summary,
+    get_payment_history_row,
     record_payment_request,
-    get_payment_requests,
+    record_payment_requests,
+    get_pending_payment_requests,
     export_payment_history_csv,
     get_unpaid_months,
-    get_paid_months
+    get_paid_months,
+    FEES_DATA_PATH
 )
 
+# Payment instructions shown for each payment method
+PAYMENT_INSTRUCTIONS = {
+    "JazzCash": """
+**JazzCash Payment Instructions:**
+- Send payment to: **0300-1234567**
+- Account Name: **School Fees Account**
+- Include Student ID in transaction
+""",
+    "EasyPaisa": """
+**EasyPaisa Payment Instructions:**
+- Send payment to: **0312-7654321**
+- Account Name: **School Fees Account**
+- Include Student ID in transaction
+""",
+    "Bank Transfer": """
+**Bank Transfer Instructions:**
+- Bank: **HBL**
+- Account #: **12345678901**
+- Account Name: **School Fees Account**
+- Include Student ID in remarks
+""",
+    "Credit/Debit Card": """
+**Card Payment:**
+- Secure payment gateway
+- You will be redirected to payment page
+- Transaction fee may apply
+"""
+}
+
+# Background workers used to warm the payment history caches
+_prefetch_executor = ThreadPoolExecutor(max_workers=2)
+
 def show_fee_summary(student_id):
     """Display fee summary for student with annual/admission fees"""
     try:
@@ -90,12 +126,28 @@ def show_paid_unpaid_status(student_id):
     except Exception as e:
         st.error(f"Error loading payment status: {str(e)}")
 
+@st.fragment
 def show_monthly_payment_section(student_id, parent_email):
     """Show monthly fee payment with month selection"""
     st.subheader("💳 Pay Monthly Fees")
     
+    # Confirmation from a request submitted before the last full rerun
+    submitted_request_id = st.session_state.pop('monthly_request_submitted', None)
+    if submitted_request_id:
+        st.success("✅ Payment Request Submitted Successfully!")
+        st.balloons()
+        st.info(f"**Request ID:** {submitted_request_id}")
+        st.info("School will verify your payment and update the status within 24 hours.")
+    
     try:
-        unpaid_months = get_unpaid_months(student_id)
+        # Keep unpaid months across widget interactions until fees_data.csv changes
+        fees_mtime = os.path.getmtime(FEES_DATA_PATH) if os.path.exists(FEES_DATA_PATH) else None
+        unpaid_key = (student_id, fees_mtime)
+        if st.session_state.get('unpaid_key') != unpaid_key:
+            st.session_state.unpaid = get_unpaid_months(student_id)
+            st.session_state.unpaid_key = unpaid_key
+        
+        unpaid_months = st.session_state.unpaid
         summary = get_student_fee_summary(student_id)
         
         if not summary:
@@ -135,35 +187,7 @@ def show_monthly_payment_section(student_id, parent_email):
             )
             
             # Show payment instructions based on method
-            if payment_method == "JazzCash":
-                st.info("""
-                **JazzCash Payment Instructions:**
-                - Send payment to: **0300-1234567**
-                - Account Name: **School Fees Account**
-                - Include Student ID in transaction
-                """)
-            elif payment_method == "EasyPaisa":
-                st.info("""
-                **EasyPaisa Payment Instructions:**
-                - Send payment to: **0312-7654321**  
-                - Account Name: **School Fees Account**
-                - Include Student ID in transaction
-                """)
-            elif payment_method == "Bank Transfer":
-                st.info("""
-                **Bank Transfer Instructions:**
-                - Bank: **HBL**
-                - Account #: **12345678901**
-                - Account Name: **School Fees Account**
-                - Include Student ID in remarks
-                """)
-            else:
-                st.info("""
-                **Card Payment:**
-                - Secure payment gateway
-                - You will be redirected to payment page
-                - Transaction fee may apply
-                """)
+            st.info(PAYMENT_INSTRUCTIONS[payment_method])
             
             # Confirm and submit
             st.write("### Confirm Payment")
@@ -178,25 +202,35 @@ def show_monthly_payment_section(student_id, parent_email):
                 )
                 
                 if request_id:
-                    st.success("✅ Payment Request Submitted Successfully!")
-                    st.balloons()
-                    st.info(f"**Request ID:** {request_id}")
-                    st.info("School will verify your payment and update the status within 24 hours.")
+                    # Rerun the whole dashboard so pending requests are refreshed
+                    st.session_state.monthly_request_submitted = request_id
+                    st.rerun(scope="app")
                 else:
                     st.error("❌ Failed to submit payment request. Please try again.")
                     
     except Exception as e:
         st.error(f"Error in payment section: {str(e)}")
 
+@st.fragment
 def show_annual_admission_payment(student_id, parent_email):
     """Show annual and admission fee payment options"""
     st.subheader("🎓 Pay Other Fees")
     
+    submitted_request_ids = st.session_state.pop('other_requests_submitted', None)
+    if submitted_request_ids:
+        st.success("✅ Payment requests submitted!")
+        st.info(f"**Request ID(s):** {', '.join(submitted_request_ids)}")
+    
     try:
         summary = get_student_fee_summary(student_id)
         if not summary:
             return
         
+        # Selected payments are collected here, per student, and submitted together
+        if 'pending_submit' not in st.session_state:
+            st.session_state.pending_submit = {}
+        pending_submit = st.session_state.pending_submit.setdefault(student_id, {})
+        
         col1, col2 = st.columns(2)
         
         with col1:
@@ -209,17 +243,14 @@ def show_annual_admission_payment(student_id, parent_email):
                     ["JazzCash", "EasyPaisa", "Bank Transfer", "Credit/Debit Card"],
                     key="annual_method"
                 )
+                st.info(PAYMENT_INSTRUCTIONS[payment_method_annual])
                 
-                if st.button(f"💳 Pay Annual Fee - ₹{summary['annual_fee']:,}", key="pay_annual", use_container_width=True):
-                    request_id = record_payment_request(
-                        student_id,
-                        parent_email,
-                        summary['annual_fee'],
-                        "Annual Fee",
-                        payment_method_annual
-                    )
-                    if request_id:
-                        st.success("✅ Annual fee payment request submitted!")
+                if st.button(f"➕ Add Annual Fee - ₹{summary['annual_fee']:,}", key="pay_annual", use_container_width=True):
+                    pending_submit["Annual Fee"] = {
+                        "amount": summary['annual_fee'],
+                        "payment_type": "Annual Fee",
+                        "payment_method": payment_method_annual
+                    }
         
         with col2:
             # Admission Fee Payment  
@@ -231,17 +262,41 @@ def show_annual_admission_payment(student_id, parent_email):
                     ["JazzCash", "EasyPaisa", "Bank Transfer", "Credit/Debit Card"],
                     key="admission_method"
                 )
+                st.info(PAYMENT_INSTRUCTIONS[payment_method_admission])
                 
-                if st.button(f"💳 Pay Admission Fee - ₹{summary['admission_fee']:,}", key="pay_admission", use_container_width=True):
-                    request_id = record_payment_request(
+                if st.button(f"➕ Add Admission Fee - ₹{summary['admission_fee']:,}", key="pay_admission", use_container_width=True):
+                    pending_submit["Admission Fee"] = {
+                        "amount": summary['admission_fee'],
+                        "payment_type": "Admission Fee",
+                        "payment_method": payment_method_admission
+                    }
+        
+        # Submit all selected payments at once
+        if pending_submit:
+            st.write("### Selected Payments")
+            for item in pending_submit.values():
+                st.write(f"**{item['payment_type']}** - ₹{item['amount']:,} via {item['payment_method']}")
+            
+            total_amount = sum(item['amount'] for item in pending_submit.values())
+            
+            col1, col2 = st.columns([3, 1])
+            
+            with col1:
+                if st.button(f"💳 Submit {len(pending_submit)} Payment(s) - ₹{total_amount:,}", key="submit_other_fees", type="primary", use_container_width=True):
+                    request_ids = record_payment_requests(
                         student_id,
                         parent_email,
-                        summary['admission_fee'],
-                        "Admission Fee", 
-                        payment_method_admission
+                        list(pending_submit.values())
                     )
-                    if request_id:
-                        st.success("✅ Admission fee payment request submitted!")
+                    if request_ids:
+                        pending_submit.clear()
+                        st.session_state.other_requests_submitted = request_ids
+                        st.rerun(scope="app")
+            
+            with col2:
+                if st.button("🗑️ Clear", key="clear_other_fees", use_container_width=True):
+                    pending_submit.clear()
+                    st.rerun(scope="fragment")
                         
     except Exception as e:
         st.error(f"Error in annual/admission payment: {str(e)}")
@@ -251,43 +306,47 @@ def show_payment_history(student_id):
     st.subheader("📋 Payment History")
     
     try:
-        history = get_payment_history(student_id)
+        history = get_payment_history_summary(student_id)
         
-        if not history:
+        if history.empty:
             st.info("No payment history found")
             return
         
-        # Create DataFrame
-        df = pd.DataFrame(history)
-        if not df.empty:
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values('date', ascending=False)
-            
-            # Display table
-            st.dataframe(
-                df[['date', 'amount', 'payment_method', 'reference', 'remarks']].rename(
-                    columns={
-                        'date': 'Date',
-                        'amount': 'Amount (₹)',
-                        'payment_method': 'Method',
-                        'reference': 'Reference',
-                        'remarks': 'Remarks'
-                    }
-                ),
-                use_container_width=True,
-                hide_index=True
-            )
+        # Display table; full details are loaded only for the selected row
+        # The history slice is already typed and sorted; only set display formats
+        event = st.dataframe(
+            history,
+            column_config={
+                'date': st.column_config.DateColumn('Date', format="DD-MM-YYYY"),
+                'amount': st.column_config.NumberColumn('Amount (₹)')
+            },
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row"
+        )
+        
+        if event.selection.rows:
+            payment = get_payment_history_row(student_id, history.index[event.selection.rows[0]])
             
-            # Download button
-            csv_data = export_payment_history_csv(student_id)
-            st.download_button(
-                label="📥 Download Payment History",
-                data=csv_data,
-                file_name=f"payment_history_{student_id}.csv",
-                mime="text/csv"
-            )
+            if payment:
+                with st.expander(f"🧾 Payment Details - {payment['date']}", expanded=True):
+                    st.write(f"**Amount:** ₹{payment['amount']:,}")
+                    st.write(f"**Method:** {payment['payment_method']}")
+                    st.write(f"**Reference:** {payment['reference']}")
+                    if payment['remarks']:
+                        st.write(f"**Remarks:** {payment['remarks']}")
         else:
-            st.info("No payment records available")
+            st.caption("Select a payment to see its details")
+        
+        # Download button
+        csv_data = export_payment_history_csv(student_id)
+        st.download_button(
+            label="📥 Download Payment History",
+            data=csv_data,
+            file_name=f"payment_history_{student_id}.csv",
+            mime="text/csv"
+        )
             
     except Exception as e:
         st.error(f"Error loading payment history: {str(e)}")
@@ -297,9 +356,7 @@ def show_pending_requests(student_id):
     st.subheader("⏳ Pending Payment Requests")
     
     try:
-        requests = get_payment_requests(student_id)
-        
-        pending_requests = [req for req in requests if req['status'] == 'pending']
+        pending_requests = get_pending_payment_requests(student_id)
         
         if not pending_requests:
             st.info("No pending payment requests")
@@ -334,6 +391,12 @@ def show_parent_dashboard(student_id, parent_email):
         # Show fee summary
         show_fee_summary(student_id)
         
+        # Load the history tab's data while the other sections render
+        prefetch = [
+            _prefetch_executor.submit(get_payment_history_summary, student_id),
+            _prefetch_executor.submit(get_pending_payment_requests, student_id)
+        ]
+        
         st.divider()
         
         # Show paid/unpaid status
@@ -351,6 +414,7 @@ def show_parent_dashboard(student_id, parent_email):
             show_annual_admission_payment(student_id, parent_email)
         
         with tab3:
+            wait(prefetch)
             show_payment_history(student_id)
             st.divider()
             show_pending_requests(student_id)
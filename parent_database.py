@@ -1,43 +1,175 @@
+import functools
+import io
 import json
 import os
-import csv
+import pickle
+import sqlite3
 from datetime import datetime
 from pathlib import Path
+import pandas as pd
+import streamlit as st
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
 
 # Shared database paths (same as admin app)
 STUDENT_DETAILS_PATH = "data/student_details.json"
 STUDENT_FEES_PATH = "data/student_fees.json"
 FEES_DATA_PATH = "fees_data.csv"  # Changed path
+# Parsed copy of fees_data.csv, stamped with the CSV's mtime and overwritten when it changes
+FEES_DATA_PICKLE_PATH = "data/fees_data.pkl"
+PAYMENT_REQUESTS_DB_PATH = "data/parent_payments.db"
+
+# Earlier JSON stores, imported into the SQLite database on startup
 PAYMENT_HISTORY_PATH = "data/parent_payments.json"
+PAYMENT_REQUESTS_LOG_PATH = "data/parent_payments.jsonl"
+
+ALL_MONTHS = (
+    "JANUARY", "FEBRUARY", "MARCH", "APRIL", "MAY", "JUNE",
+    "JULY", "AUGUST", "SEPTEMBER", "OCTOBER", "NOVEMBER", "DECEMBER"
+)
 
+# fees_data.csv columns used by the parent dashboard
+FEES_DATA_COLUMNS = [
+    'ID', 'Month', 'Date', 'Monthly Fee', 'Received Amount',
+    'Payment Method', 'Reference No', 'Remarks'
+]
+
+@functools.lru_cache(maxsize=1)
 def ensure_databases_exist():
-    """Ensure all required databases exist"""
+    """Ensure all required databases exist (runs once per process)"""
     Path("data").mkdir(exist_ok=True)
     
-    if not os.path.exists(PAYMENT_HISTORY_PATH):
-        with open(PAYMENT_HISTORY_PATH, 'w') as f:
-            json.dump({}, f)
+    conn = _connect()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS payment_requests (
+                request_id TEXT PRIMARY KEY,
+                student_id TEXT,
+                parent_email TEXT,
+                amount NUMERIC,
+                payment_type TEXT,
+                payment_method TEXT,
+                status TEXT,
+                requested_at TEXT,
+                selected_months TEXT
+            )
+        """)
+        # The composite index also serves lookups by student_id alone
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_prq_student_status ON payment_requests(student_id, status)")
+        conn.execute("DROP INDEX IF EXISTS idx_prq_student")
+        
+        _import_json_payment_requests(conn)
+    finally:
+        conn.close()
+
+def _connect():
+    """Open a connection to the payment requests database"""
+    conn = sqlite3.connect(PAYMENT_REQUESTS_DB_PATH, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-8192")
+    return conn
+
+def _json_loads(data):
+    """Parse JSON text or bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps(obj, indent=False):
+    """Serialize an object to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    return json.dumps(obj, indent=2 if indent else None).encode('utf-8')
+
+def _file_mtime(path):
+    """Get file modification time, or None if the file doesn't exist"""
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_students(mtime):
+    """Load all student details (cached until the file changes)"""
+    with open(STUDENT_DETAILS_PATH, 'rb') as f:
+        return _json_loads(f.read())
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_fees(mtime):
+    """Load all student fees (cached until the file changes)"""
+    with open(STUDENT_FEES_PATH, 'rb') as f:
+        return _json_loads(f.read())
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def _fees_df(mtime):
+    """Load fees_data.csv into a typed DataFrame (cached until the file changes)
+
+    The parsed frame is also kept in one pickle file so a restarted server
+    can skip parsing the CSV while it is unchanged.
+    """
+    try:
+        if _file_mtime(FEES_DATA_PICKLE_PATH) == mtime:
+            return pd.read_pickle(FEES_DATA_PICKLE_PATH)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        pass
+    
+    # Taken before reading, so a write during the parse can't stamp stale data as current
+    csv_mtime_ns = os.stat(FEES_DATA_PATH).st_mtime_ns
+    df = pd.read_csv(
+        FEES_DATA_PATH,
+        usecols=lambda col: col in FEES_DATA_COLUMNS,
+        dtype={'ID': 'string'}
+    ).reindex(columns=FEES_DATA_COLUMNS)
+    
+    for col in ['Monthly Fee', 'Received Amount']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    
+    try:
+        os.makedirs(os.path.dirname(FEES_DATA_PICKLE_PATH), exist_ok=True)
+        df.to_pickle(FEES_DATA_PICKLE_PATH)
+        os.utime(FEES_DATA_PICKLE_PATH, ns=(csv_mtime_ns, csv_mtime_ns))
+    except OSError:
+        pass  # Only a restart speed-up; the CSV stays the source of truth
+    
+    return df
+
+def _get_all_fee_rows():
+    """Get all fees_data.csv rows, or an empty frame if the file doesn't exist"""
+    mtime = _file_mtime(FEES_DATA_PATH)
+    if mtime is None:
+        return pd.DataFrame(columns=FEES_DATA_COLUMNS)
+    
+    return _fees_df(mtime)
+
+def _get_fee_rows(student_id):
+    """Get the fees_data.csv rows belonging to a student"""
+    df = _get_all_fee_rows()
+    return df[df['ID'] == student_id]
 
 def get_student_details(student_id):
     """Get student details from admin database"""
-    if not os.path.exists(STUDENT_DETAILS_PATH):
+    mtime = _file_mtime(STUDENT_DETAILS_PATH)
+    if mtime is None:
         return None
     
-    with open(STUDENT_DETAILS_PATH, 'r') as f:
-        students = json.load(f)
-    
-    return students.get(student_id, None)
+    return _load_students(mtime).get(student_id, None)
 
 def get_student_fees(student_id):
     """Get student fee details"""
-    if not os.path.exists(STUDENT_FEES_PATH):
+    mtime = _file_mtime(STUDENT_FEES_PATH)
+    if mtime is None:
         return None
     
-    with open(STUDENT_FEES_PATH, 'r') as f:
-        fees = json.load(f)
-    
-    return fees.get(student_id, None)
+    return _load_fees(mtime).get(student_id, None)
 
+@st.cache_data(ttl=10, max_entries=256, show_spinner=False)
 def get_student_fee_summary(student_id):
     """Get comprehensive fee summary for student"""
     ensure_databases_exist()
@@ -54,16 +186,9 @@ def get_student_fee_summary(student_id):
     annual_fee = fees.get("annual_fee", 0)
     
     # Get received amount from fees_data.csv
-    received = 0
-    if os.path.exists(FEES_DATA_PATH):
-        with open(FEES_DATA_PATH, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row.get('ID') == student_id:  # Changed from 'Student ID' to 'ID'
-                    try:
-                        received += float(row.get('Received Amount', 0))
-                    except:
-                        pass
+    # Select only the amount column for matching rows instead of slicing whole rows
+    df = _get_all_fee_rows()
+    received = float(df.loc[df['ID'] == student_id, 'Received Amount'].sum())
     
     total_due = (monthly_fee * 12) + admission_fee + annual_fee
     balance = total_due - received
@@ -81,114 +206,245 @@ def get_student_fee_summary(student_id):
         "percentage_paid": round((received / total_due * 100) if total_due > 0 else 0, 2)
     }
 
+def _paid_month_names(student_id):
+    """Get the names of months with a monthly fee paid, without building row details"""
+    df = _get_all_fee_rows()
+    return set(df.loc[(df['ID'] == student_id) & (df['Monthly Fee'] > 0), 'Month'])
+
+@st.cache_data(ttl=10, max_entries=256, show_spinner=False)
 def get_paid_months(student_id):
     """Get list of paid months with details"""
-    paid_months = []
-    
-    if os.path.exists(FEES_DATA_PATH):
-        with open(FEES_DATA_PATH, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row.get('ID') == student_id and float(row.get('Monthly Fee', 0)) > 0:
-                    paid_months.append({
-                        'month': row.get('Month', ''),
-                        'amount': float(row.get('Monthly Fee', 0)),
-                        'date': row.get('Date', ''),
-                        'method': row.get('Payment Method', '')
-                    })
-    
-    return paid_months
+    rows = _get_fee_rows(student_id)
+    paid_rows = rows[rows['Monthly Fee'] > 0]
+    
+    paid_months = paid_rows[['Month', 'Monthly Fee', 'Date', 'Payment Method']].rename(
+        columns={
+            'Month': 'month',
+            'Monthly Fee': 'amount',
+            'Date': 'date',
+            'Payment Method': 'method'
+        }
+    )
+    paid_months['date'] = paid_months['date'].dt.strftime('%Y-%m-%d')
+    paid_months = paid_months.fillna({'month': '', 'date': '', 'method': ''})
+    
+    return paid_months.to_dict('records')
 
 def get_unpaid_months(student_id):
     """Get list of unpaid months"""
-    all_months = [
-        "JANUARY", "FEBRUARY", "MARCH", "APRIL", "MAY", "JUNE",
-        "JULY", "AUGUST", "SEPTEMBER", "OCTOBER", "NOVEMBER", "DECEMBER"
-    ]
-    
-    paid_months_data = get_paid_months(student_id)
-    paid_months = [pm['month'] for pm in paid_months_data]
+    return _unpaid_months(student_id, _file_mtime(FEES_DATA_PATH))
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _unpaid_months(student_id, mtime):
+    """Get a student's unpaid months (cached until fees_data.csv changes)"""
+    paid_months = _paid_month_names(student_id)
     
-    unpaid_months = [month for month in all_months if month not in paid_months]
+    unpaid_months = [month for month in ALL_MONTHS if month not in paid_months]
     return unpaid_months
 
+@st.cache_data(ttl=10, max_entries=256, show_spinner=False)
 def get_payment_history(student_id):
-    """Get payment history for student"""
+    """Get payment history for student as a DataFrame, newest first"""
+    return _payment_history_frame(student_id)
+
+def _payment_history_frame(student_id):
+    """Build a student's payment history from the current fees_data.csv rows"""
     ensure_databases_exist()
     
-    history = []
-    
-    if os.path.exists(FEES_DATA_PATH):
-        with open(FEES_DATA_PATH, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row.get('ID') == student_id:
-                    try:
-                        amount = float(row.get('Received Amount', 0))
-                        if amount > 0:  # Only show actual payments
-                            history.append({
-                                "date": row.get('Date', 'N/A'),
-                                "amount": amount,
-                                "payment_method": row.get('Payment Method', 'Cash'),
-                                "reference": row.get('Reference No', 'N/A'),
-                                "remarks": row.get('Remarks', '')
-                            })
-                    except:
-                        continue
-    
-    return sorted(history, key=lambda x: x['date'], reverse=True)
+    rows = _get_fee_rows(student_id)
+    history = rows[rows['Received Amount'] > 0]  # Only show actual payments
+    
+    history = history[['Date', 'Received Amount', 'Payment Method', 'Reference No', 'Remarks']].rename(
+        columns={
+            'Date': 'date',
+            'Received Amount': 'amount',
+            'Payment Method': 'payment_method',
+            'Reference No': 'reference',
+            'Remarks': 'remarks'
+        }
+    ).fillna({'payment_method': 'Cash', 'reference': 'N/A', 'remarks': ''})
+    
+    return history.sort_values('date', ascending=False)
+
+@st.cache_data(ttl=10, max_entries=256, show_spinner=False)
+def get_payment_history_summary(student_id, limit=20):
+    """Get date and amount of the most recent payments, keyed by row id"""
+    return get_payment_history(student_id).head(limit)[['date', 'amount']]
+
+def get_payment_history_row(student_id, row_id):
+    """Get full details of a single payment from the history summary"""
+    history = get_payment_history(student_id)
+    
+    if row_id not in history.index:
+        return None
+    
+    payment = history.loc[row_id].to_dict()
+    payment['date'] = payment['date'].strftime('%d-%m-%Y') if pd.notna(payment['date']) else 'N/A'
+    return payment
 
 def record_payment_request(student_id, parent_email, amount, payment_type, payment_method, selected_months=None):
     """Record a payment request from parent"""
+    return record_payment_requests(student_id, parent_email, [{
+        "amount": amount,
+        "payment_type": payment_type,
+        "payment_method": payment_method,
+        "selected_months": selected_months
+    }])[0]
+
+def record_payment_requests(student_id, parent_email, items):
+    """Record several payment requests from parent in a single transaction"""
     ensure_databases_exist()
     
+    now = datetime.now()
+    base_id = f"PR_{now.strftime('%Y%m%d%H%M%S')}"
+    
+    conn = _connect()
     try:
-        with open(PAYMENT_HISTORY_PATH, 'r') as f:
-            payments = json.load(f)
+        conn.execute("BEGIN IMMEDIATE")
+        
+        # Requests made in the same second share a timestamp, so number them
+        taken = {
+            row["request_id"] for row in conn.execute(
+                "SELECT request_id FROM payment_requests WHERE request_id >= ? AND request_id < ?",
+                (base_id, base_id + "~")
+            )
+        }
+        
+        request_ids = []
+        suffix = 0
+        for item in items:
+            request_id = base_id
+            while request_id in taken:
+                suffix += 1
+                request_id = f"{base_id}_{suffix}"
+            taken.add(request_id)
+            
+            conn.execute(
+                "INSERT INTO payment_requests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    request_id,
+                    student_id,
+                    parent_email,
+                    item["amount"],
+                    item["payment_type"],
+                    item["payment_method"],
+                    "pending",
+                    now.strftime("%Y-%m-%d %H:%M:%S"),
+                    _json_dumps(item.get("selected_months") or []).decode('utf-8')
+                )
+            )
+            request_ids.append(request_id)
+        
+        conn.execute("COMMIT")
     except:
-        payments = {}
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
     
-    request_id = f"PR_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    # Make the new requests visible immediately
+    get_payment_requests.clear()
+    get_pending_payment_requests.clear()
     
-    if student_id not in payments:
-        payments[student_id] = []
+    return request_ids
+
+def _read_json_payment_requests():
+    """Read requests from the parent_payments.json snapshot and JSON Lines log"""
+    try:
+        with open(PAYMENT_HISTORY_PATH, 'rb') as f:
+            payments = _json_loads(f.read())
+    except:
+        payments = {}
     
-    payment_data = {
-        "request_id": request_id,
-        "parent_email": parent_email,
-        "amount": amount,
-        "payment_type": payment_type,
-        "payment_method": payment_method,
-        "status": "pending",
-        "requested_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "selected_months": selected_months if selected_months else []
-    }
+    if os.path.exists(PAYMENT_REQUESTS_LOG_PATH):
+        with open(PAYMENT_REQUESTS_LOG_PATH, 'rb') as f:
+            for line in f:
+                try:
+                    record = _json_loads(line)
+                except ValueError:
+                    continue  # Skip a partially written line
+                payments.setdefault(record["student_id"], []).append(record)
     
-    payments[student_id].append(payment_data)
+    return payments
+
+def _import_json_payment_requests(conn):
+    """Copy requests from the JSON stores into the database (already imported ones are skipped)"""
+    if not os.path.exists(PAYMENT_HISTORY_PATH) and not os.path.exists(PAYMENT_REQUESTS_LOG_PATH):
+        return
     
-    with open(PAYMENT_HISTORY_PATH, 'w') as f:
-        json.dump(payments, f, indent=2)
+    rows = [
+        (
+            req["request_id"],
+            student_id,
+            req.get("parent_email"),
+            req.get("amount", 0),
+            req.get("payment_type"),
+            req.get("payment_method"),
+            req.get("status", "pending"),
+            req.get("requested_at"),
+            _json_dumps(req.get("selected_months") or []).decode('utf-8')
+        )
+        for student_id, requests in _read_json_payment_requests().items()
+        for req in requests
+        if req.get("request_id")  # Portal payments in the same file have no request ID
+    ]
     
-    return request_id
+    conn.execute("BEGIN")
+    conn.executemany("INSERT OR IGNORE INTO payment_requests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.execute("COMMIT")
 
+def _request_from_row(row):
+    """Convert a payment_requests row into a request dict"""
+    request = dict(row)
+    request["selected_months"] = _json_loads(request["selected_months"] or "[]")
+    return request
+
+@st.cache_data(ttl=10, max_entries=256, show_spinner=False)
 def get_payment_requests(student_id):
     """Get all payment requests for a student"""
     ensure_databases_exist()
     
+    conn = _connect()
     try:
-        with open(PAYMENT_HISTORY_PATH, 'r') as f:
-            payments = json.load(f)
-    except:
-        payments = {}
+        rows = conn.execute(
+            "SELECT * FROM payment_requests WHERE student_id = ? ORDER BY requested_at",
+            (student_id,)
+        ).fetchall()
+    finally:
+        conn.close()
     
-    return payments.get(student_id, [])
+    return [_request_from_row(row) for row in rows]
 
-def export_payment_history_csv(student_id):
-    """Export payment history as CSV"""
-    history = get_payment_history(student_id)
+@st.cache_data(ttl=10, max_entries=256, show_spinner=False)
+def get_pending_payment_requests(student_id):
+    """Get only the pending payment requests for a student"""
+    ensure_databases_exist()
     
-    csv_data = "Date,Amount,Payment Method,Reference,Remarks\n"
-    for payment in history:
-        csv_data += f"{payment['date']},{payment['amount']},{payment['payment_method']},{payment['reference']},{payment['remarks']}\n"
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM payment_requests WHERE student_id = ? AND status = 'pending' ORDER BY requested_at",
+            (student_id,)
+        ).fetchall()
+    finally:
+        conn.close()
     
-    return csv_data
\ No newline at end of file
+    return [_request_from_row(row) for row in rows]
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _payment_history_csv(student_id, mtime):
+    """Build the payment history CSV (cached until fees_data.csv changes)"""
+    buf = io.StringIO()
+    # Built from the mtime-keyed rows, not get_payment_history, whose TTL cache
+    # can still hold the history from before the change
+    _payment_history_frame(student_id).to_csv(
+        buf,
+        index=False,
+        header=['Date', 'Amount', 'Payment Method', 'Reference', 'Remarks'],
+        date_format='%Y-%m-%d'
+    )
+    return buf.getvalue().encode('utf-8')
+
+def export_payment_history_csv(student_id):
+    """Export payment history as CSV"""
+    return _payment_history_csv(student_id, _file_mtime(FEES_DATA_PATH))
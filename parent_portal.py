@@ -1,19 +1,52 @@
 # type:ignore
 import streamlit as st
 import os
+import copy
 import json
+import functools
+import logging
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
 from parent_auth import (
     authenticate_parent, 
     create_parent_account, 
     check_parent_authentication,
     logout_parent
 )
-from database import load_school_config, load_data, load_student_details, load_student_fees
+from database import load_school_config, load_data, load_student_details, load_student_fees, get_file_mtime
 from utils import format_currency
 
+logger = logging.getLogger(__name__)
+
+# Payments submitted through the portal are appended here, one JSON object per line
+PARENT_PAYMENTS_LOG = "data/parent_payments.jsonl"
+
+# Months of the academic year, in order
+ALL_MONTHS: tuple[str, ...] = (
+    "APRIL", "MAY", "JUNE", "JULY", "AUGUST", "SEPTEMBER",
+    "OCTOBER", "NOVEMBER", "DECEMBER", "JANUARY", "FEBRUARY", "MARCH"
+)
+_ALL_MONTHS_ARRAY = np.array(ALL_MONTHS)
+
+# Columnar copy of the fee columns the portal reads from fees_data.csv
+FEES_PARQUET_PATH = "data/fees_data.parquet"
+FEE_COLUMNS = (
+    "ID", "Month", "Monthly Fee", "Annual Charges", "Admission Fee",
+    "Received Amount", "Date", "Payment Method"
+)
+# Amount columns summed for the fee totals
+AMOUNT_COLUMNS = ("Monthly Fee", "Annual Charges", "Admission Fee", "Received Amount")
+
 # Page configuration for parent portal
 st.set_page_config(
     page_title="Parent Portal - School Fees Management",
@@ -22,122 +55,307 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def get_parent_info(email):
-    """Get parent information from database"""
+@functools.lru_cache(maxsize=4)
+def _parents_cached(mtime_ns):
+    """Read parents.json (cached per file modification time)"""
+    with open("parents.json", 'r') as f:
+        return json.load(f)
+
+def _load_parents():
+    """Load the parents database, or an empty one if it can't be read"""
     try:
-        with open("parents.json", 'r') as f:
-            parents = json.load(f)
-        
-        if email in parents:
-            return parents[email]
-        return {}
-    except Exception as e:
-        print(f"Error getting parent info: {str(e)}")
+        return _parents_cached(os.stat("parents.json").st_mtime_ns)
+    except (OSError, json.JSONDecodeError):
+        logger.exception("Error loading parents database")
         return {}
 
+def get_parent_info(email):
+    """Get parent information from database"""
+    return _load_parents().get(email, {})
+
 def get_parent_students(email):
     """Get student IDs linked to parent"""
-    try:
-        with open("parents.json", 'r') as f:
-            parents = json.load(f)
-        
-        if email in parents:
-            return parents[email].get('student_ids', [])
-        return []
-    except Exception as e:
-        print(f"Error getting student list: {str(e)}")
-        return []
+    return _load_parents().get(email, {}).get('student_ids', [])
 
-def get_student_monthly_fee(student_id):
-    """Get student's monthly fee amount"""
+@st.cache_data(max_entries=1, show_spinner=False)
+def _student_fees_cached(mtime_ns):
+    """Load student fees once per student_fees.json modification"""
+    return load_student_fees()
+
+def _load_student_fees():
+    """Get student fees from the cached loader"""
+    return _student_fees_cached(get_file_mtime("student_fees.json"))
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def _school_cfg(mtime_ns):
+    """Load school configuration once per school_config.json modification"""
+    return load_school_config()
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def _default_fees_cached(mtime_ns):
+    """Load default fees once per default_fees.json modification"""
+    from database import load_default_fees
+    return load_default_fees()
+
+def get_student_fees(student_id):
+    """Get student's (monthly, annual, admission) fee amounts"""
     try:
-        student_fees = load_student_fees()
+        student_fees = _load_student_fees()
         if student_id in student_fees:
-            return student_fees[student_id].get('monthly_fee', 3000)
+            fees = student_fees[student_id]
+            return (
+                fees.get('monthly_fee', 3000),
+                fees.get('annual_fee', 3500),
+                fees.get('admission_fee', 10000)
+            )
         
-        # Default fee if not set
-        from database import load_default_fees
-        default_fees = load_default_fees()
-        return default_fees.get('monthly_fee', 3000)
+        # Default fees if not set
+        default_fees = _default_fees_cached(get_file_mtime("default_fees.json"))
+        return (
+            default_fees.get('monthly_fee', 3000),
+            default_fees.get('annual_charges', 3500),
+            default_fees.get('admission_fee', 10000)
+        )
     except:
-        return 3000
+        return 3000, 3500, 10000
+
+def get_student_monthly_fee(student_id):
+    """Get student's monthly fee amount"""
+    return get_student_fees(student_id)[0]
 
 def get_student_annual_fee(student_id):
     """Get student's annual fee amount"""
-    try:
-        student_fees = load_student_fees()
-        if student_id in student_fees:
-            return student_fees[student_id].get('annual_fee', 3500)
-        
-        from database import load_default_fees
-        default_fees = load_default_fees()
-        return default_fees.get('annual_charges', 3500)
-    except:
-        return 3500
+    return get_student_fees(student_id)[1]
 
 def get_student_admission_fee(student_id):
     """Get student's admission fee amount"""
+    return get_student_fees(student_id)[2]
+
+def _load_fee_columns(mtime_ns):
+    """Load the fee columns, preferring a Parquet copy kept in step with fees_data.csv"""
     try:
-        student_fees = load_student_fees()
-        if student_id in student_fees:
-            return student_fees[student_id].get('admission_fee', 10000)
+        if mtime_ns is not None and get_file_mtime(FEES_PARQUET_PATH) == mtime_ns:
+            return pd.read_parquet(FEES_PARQUET_PATH, columns=list(FEE_COLUMNS))
+    except (ImportError, OSError, KeyError, ValueError):
+        pass
+
+    df = load_data()
+    if 'ID' not in df.columns:
+        return df
+    df = df[list(FEE_COLUMNS)].astype({'ID': 'string'})
+
+    # Refresh the Parquet copy and stamp it with the CSV's mtime so the next
+    # process can skip parsing the CSV; without pyarrow we just keep the CSV
+    try:
+        os.makedirs(os.path.dirname(FEES_PARQUET_PATH), exist_ok=True)
+        df.to_parquet(FEES_PARQUET_PATH, index=False)
+        os.utime(FEES_PARQUET_PATH, ns=(mtime_ns, mtime_ns))
+    except (ImportError, OSError, TypeError, ValueError):
+        pass
+    return df
+
+def _format_rs(val):
+    """Format an amount as rupees, showing a decimal part only when there is one"""
+    if pd.isna(val) or val == 0:
+        return "Rs. 0"
+    if float(val).is_integer():
+        return f"Rs. {int(val):,}"
+    return f"Rs. {val:,}"
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def _load_data_indexed(mtime_ns):
+    """Load payment records indexed by student ID (cached per fees_data.csv modification)"""
+    df = _load_fee_columns(mtime_ns)
+    if 'ID' not in df.columns:
+        return df
+    
+    # Month comparisons and groupbys work on small integer codes instead of strings
+    df['Month'] = pd.Categorical(
+        df['Month'].astype('string').str.upper(),
+        categories=ALL_MONTHS,
+        ordered=True
+    )
+    # load_data() formats Date as dd-mm-yyyy text; parse it once for sorting
+    df['Paid On'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='coerce')
+    # Display strings for the amounts, formatted once per load instead of per render
+    for col in AMOUNT_COLUMNS:
+        df[f"{col}_fmt"] = df[col].map(_format_rs)
+    # A stable sort keeps each student's rows in file order
+    return df.set_index('ID', drop=False).sort_index(kind='stable')
+
+def _get_student_records(df_indexed, student_id):
+    """Get a student's rows from the ID-indexed payment records"""
+    if student_id in df_indexed.index:
+        # List form keeps a DataFrame even when there is a single row
+        return df_indexed.loc[[student_id]]
+    return df_indexed.iloc[0:0]
+
+def _reduce_student(month_codes, amounts):
+    """Scan a student's rows once for the first paid row of each month and the fee totals
+
+    month_codes holds the Month categorical codes (-1 for unknown months) and
+    amounts the AMOUNT_COLUMNS as a float array with one row per record.
+    """
+    first_rows = np.full(12, -1, dtype=np.int64)
+    totals = np.zeros(4)
+    annual_paid = False
+    admission_paid = False
+    for i in range(month_codes.shape[0]):
+        code = month_codes[i]
+        if amounts[i, 0] > 0 and code >= 0 and first_rows[code] < 0:
+            first_rows[code] = i
+        if amounts[i, 1] > 0:
+            annual_paid = True
+        if amounts[i, 2] > 0:
+            admission_paid = True
+        for j in range(4):
+            # NaN != NaN, so missing amounts are skipped like in pandas' sum
+            if amounts[i, j] == amounts[i, j]:
+                totals[j] += amounts[i, j]
+    return first_rows, totals, annual_paid, admission_paid
+
+@functools.lru_cache(maxsize=1)
+def _reduce_kernel():
+    """JIT-compile _reduce_student on first use, or None when numba isn't installed"""
+    try:
+        from numba import njit
+    except ImportError:  # Optional; the pandas reduction is used without it
+        return None
+    return njit(cache=True)(_reduce_student)
+
+def _column_totals(student_records, totals):
+    """Give float totals of AMOUNT_COLUMNS back their column's integer type, so
+    they display as "Rs. 12,500" like a per-column sum would"""
+    return tuple(
+        int(total) if pd.api.types.is_integer_dtype(student_records[col].dtype) else total
+        for col, total in zip(AMOUNT_COLUMNS, totals)
+    )
+
+def _reduce_student_records(student_records):
+    """Get the paid month positions in ALL_MONTHS with their first payment amounts and
+    dates, annual/admission paid flags and the (monthly, annual, admission, received)
+    totals for a student's records"""
+    reduce_kernel = _reduce_kernel()
+    if reduce_kernel is not None:
+        values = student_records[list(AMOUNT_COLUMNS)].to_numpy(dtype=np.float64, na_value=np.nan)
+        first_rows, totals, annual_paid, admission_paid = reduce_kernel(
+            student_records['Month'].cat.codes.to_numpy(), values
+        )
         
-        from database import load_default_fees
-        default_fees = load_default_fees()
-        return default_fees.get('admission_fee', 10000)
-    except:
-        return 10000
+        positions = np.flatnonzero(first_rows >= 0)
+        rows = first_rows[positions]
+        # Amounts come from the column itself so integer fees stay integers
+        return (
+            positions,
+            student_records['Monthly Fee'].to_numpy()[rows],
+            student_records['Date'].to_numpy()[rows],
+            annual_paid,
+            admission_paid,
+            _column_totals(student_records, totals)
+        )
+    
+    # Whole first paid row per month, like the kernel; groupby first() would
+    # fill a blank Date from a later row. Sorted into academic year order
+    paid_records = student_records[(student_records['Monthly Fee'] > 0) & student_records['Month'].notna()]
+    first_payments = paid_records.drop_duplicates('Month')
+    month_codes = first_payments['Month'].cat.codes.to_numpy()
+    order = np.argsort(month_codes, kind='stable')
+    
+    annual_paid = bool((student_records['Annual Charges'] > 0).any())
+    admission_paid = bool((student_records['Admission Fee'] > 0).any())
+    if student_records.empty:
+        totals = (0.0, 0.0, 0.0, 0.0)
+    else:
+        # One reduction over the four amount columns; nansum skips missing
+        # amounts the same way DataFrame.sum does
+        values = student_records[list(AMOUNT_COLUMNS)].to_numpy(dtype=np.float64, na_value=np.nan)
+        totals = np.nansum(values, axis=0)
+    return (
+        month_codes[order],
+        first_payments['Monthly Fee'].to_numpy()[order],
+        first_payments['Date'].to_numpy()[order],
+        annual_paid,
+        admission_paid,
+        _column_totals(student_records, totals)
+    )
 
 def get_student_fee_details(student_id):
     """Get comprehensive fee details for student including paid/unpaid months"""
+    return _fee_details_cached(
+        student_id,
+        get_file_mtime("fees_data.csv"),
+        get_file_mtime("student_details.json"),
+        get_file_mtime("student_fees.json"),
+        get_file_mtime("default_fees.json")
+    )
+
+# Fee details for a student with no payment records yet
+_EMPTY_FEE_DETAILS = {
+    "total_monthly": 0,
+    "total_annual": 0,
+    "total_admission": 0,
+    "total_received": 0,
+    "percentage_paid": 0,
+    "paid_months": [],
+    "paid_months_by_name": {},
+    "unpaid_months": list(ALL_MONTHS),
+    "total_paid_months": 0,
+    "total_unpaid_months": len(ALL_MONTHS),
+    "annual_paid": False,
+    "admission_paid": False
+}
+
+def _empty_fee_details(student_id, student_info, monthly_fee_amount, annual_fee_amount, admission_fee_amount):
+    """Build fee details for a student who hasn't paid anything: every fee is still due"""
+    total_due = monthly_fee_amount * 12 + annual_fee_amount + admission_fee_amount
+    details = copy.deepcopy(_EMPTY_FEE_DETAILS)
+    details.update({
+        "student_id": student_id,
+        "student_name": student_info.get('student_name', 'N/A'),
+        "father_name": student_info.get('father_name', 'N/A'),
+        "class": student_info.get('class_category', 'N/A'),
+        "phone": student_info.get('phone', 'N/A'),
+        "monthly_fee": monthly_fee_amount,
+        "annual_fee": annual_fee_amount,
+        "admission_fee": admission_fee_amount,
+        "total_due": total_due,
+        "balance_due": max(0, total_due)
+    })
+    return details
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _fee_details_cached(student_id, data_mtime, details_mtime, fees_mtime, defaults_mtime):
+    """Compute fee details (cached until one of the source files changes)"""
     try:
-        df = load_data()
+        df = _load_data_indexed(data_mtime)
         student_details = load_student_details()
         
         if student_id not in student_details:
             return None
         
         student_info = student_details[student_id]
-        student_records = df[df['ID'] == student_id]
-        
-        # All months in academic year
-        all_months = [
-            "APRIL", "MAY", "JUNE", "JULY", "AUGUST", "SEPTEMBER",
-            "OCTOBER", "NOVEMBER", "DECEMBER", "JANUARY", "FEBRUARY", "MARCH"
-        ]
+        student_records = _get_student_records(df, student_id)
         
         # Get fee amounts
-        monthly_fee_amount = get_student_monthly_fee(student_id)
-        annual_fee_amount = get_student_annual_fee(student_id)
-        admission_fee_amount = get_student_admission_fee(student_id)
+        monthly_fee_amount, annual_fee_amount, admission_fee_amount = get_student_fees(student_id)
         
-        # Calculate paid and unpaid months
-        paid_months = []
-        unpaid_months = []
+        if student_records.empty:
+            return _empty_fee_details(
+                student_id, student_info, monthly_fee_amount, annual_fee_amount, admission_fee_amount
+            )
         
-        for month in all_months:
-            month_records = student_records[
-                (student_records['Month'] == month) & 
-                (student_records['Monthly Fee'] > 0)
-            ]
-            if not month_records.empty:
-                paid_months.append({
-                    'month': month,
-                    'amount': month_records['Monthly Fee'].iloc[0],
-                    'date': month_records['Date'].iloc[0] if 'Date' in month_records.columns else 'N/A'
-                })
-            else:
-                unpaid_months.append(month)
+        positions, amounts, dates, annual_paid, admission_paid, totals = _reduce_student_records(student_records)
         
-        # Check if annual and admission fees are paid
-        annual_paid = not student_records[student_records['Annual Charges'] > 0].empty
-        admission_paid = not student_records[student_records['Admission Fee'] > 0].empty
+        # Calculate paid and unpaid months
+        paid_months = [
+            {'month': ALL_MONTHS[i], 'amount': amount, 'date': date}
+            for i, amount, date in zip(positions, amounts, dates)
+        ]
+        unpaid_mask = np.ones(len(ALL_MONTHS), dtype=bool)
+        unpaid_mask[positions] = False
+        unpaid_months = _ALL_MONTHS_ARRAY[unpaid_mask].tolist()
         
-        # Calculate totals
-        total_monthly = student_records['Monthly Fee'].sum() if not student_records.empty else 0
-        total_annual = student_records['Annual Charges'].sum() if not student_records.empty else 0
-        total_admission = student_records['Admission Fee'].sum() if not student_records.empty else 0
-        total_received = student_records['Received Amount'].sum() if not student_records.empty else 0
+        total_monthly, total_annual, total_admission, total_received = totals
         
         # Calculate outstanding
         total_paid_months = len(paid_months)
@@ -166,16 +384,31 @@ def get_student_fee_details(student_id):
             "balance_due": balance_due,
             "percentage_paid": round((total_received / total_due * 100) if total_due > 0 else 0, 1),
             "paid_months": paid_months,
+            "paid_months_by_name": {p['month']: p for p in paid_months},
             "unpaid_months": unpaid_months,
             "total_paid_months": total_paid_months,
             "total_unpaid_months": total_unpaid_months,
             "annual_paid": annual_paid,
             "admission_paid": admission_paid
         }
-    except Exception as e:
-        print(f"Error getting fee details: {str(e)}")
+    except Exception:
+        logger.exception("Error getting fee details for %s", student_id)
         return None
 
+def save_parent_payment(payment_data):
+    """Append a submitted payment to the parent payments log"""
+    os.makedirs("data", exist_ok=True)
+    
+    if orjson is not None:
+        line = orjson.dumps(payment_data, option=orjson.OPT_APPEND_NEWLINE)
+    else:
+        line = (json.dumps(payment_data, separators=(",", ":")) + "\n").encode('utf-8')
+    
+    with open(PARENT_PAYMENTS_LOG, 'ab') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)  # Released when the file is closed
+        f.write(line)
+
 def add_back_button():
     """Add back button to return to dashboard"""
     if st.button("⬅️ Back to Dashboard", use_container_width=True):
@@ -184,27 +417,36 @@ def add_back_button():
 
 def show_payment_interface(student_id, fee_details):
     """Show complete payment interface with all fee options"""
+    if _payment_header(fee_details):
+        _payment_body(fee_details, student_id)
+
+def _payment_header(fee_details):
+    """Show the payment heading and balance, returning False when nothing is due"""
     st.subheader("💳 Make Payment")
-    
+
     if fee_details['balance_due'] == 0:
         st.success("""
         # 🎉 All Fees Paid!
-        
+
         ### Your account is up to date. No payment required at this time.
-        
+
         Thank you for your timely payments!
         """)
-        return
-    
+        return False
+
     # Payment header with balance
     st.warning(f"""
     # 💰 Payment Required
-    
+
     ### Current Balance Due: **Rs. {fee_details['balance_due']:,}**
-    
+
     Please choose what you want to pay:
     """)
-    
+    return True
+
+@st.fragment
+def _payment_body(fee_details, student_id):
+    """Payment type, method and confirmation form; reruns on its own as options change"""
     # Payment type selection
     payment_type = st.radio(
         "Select Payment Type:",
@@ -343,22 +585,7 @@ def show_payment_interface(student_id, fee_details):
                         }
                         
                         # Save to parent payments file
-                        payment_file = "data/parent_payments.json"
-                        os.makedirs("data", exist_ok=True)
-                        
-                        if os.path.exists(payment_file):
-                            with open(payment_file, 'r') as f:
-                                payments = json.load(f)
-                        else:
-                            payments = {}
-                        
-                        if student_id not in payments:
-                            payments[student_id] = []
-                        
-                        payments[student_id].append(payment_data)
-                        
-                        with open(payment_file, 'w') as f:
-                            json.dump(payments, f, indent=2)
+                        save_parent_payment(payment_data)
                         
                         st.success("""
                         ✅ Payment Request Submitted Successfully!
@@ -375,19 +602,46 @@ def show_payment_interface(student_id, fee_details):
                     except Exception as e:
                         st.error(f"Payment processing error: {str(e)}")
 
+@functools.lru_cache(maxsize=8)
+def _login_header(school_name):
+    """Build the gradient school banner shown above the login form"""
+    return f"""
+    <div style="text-align: center; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); border-radius: 10px; color: white; margin-bottom: 30px;">
+        <h1 style="margin: 0; font-size: 2.5rem;">🏫 {school_name}</h1>
+        <h2 style="margin: 0; font-size: 1.5rem;">Parent Portal</h2>
+    </div>
+    """
+
+@functools.lru_cache(maxsize=8)
+def _welcome_card(parent_name, email, phone):
+    """Build the gradient welcome card shown in the dashboard sidebar"""
+    return f"""
+        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 20px; border-radius: 10px; color: white; margin-bottom: 20px;">
+            <h3 style="margin: 0; font-size: 1.2rem;">👋 Welcome!</h3>
+            <p style="margin: 5px 0; font-size: 1rem;"><strong>{parent_name}</strong></p>
+            <p style="margin: 5px 0; font-size: 0.8rem;">{email}</p>
+            <p style="margin: 5px 0; font-size: 0.8rem;">📱 {phone}</p>
+        </div>
+        """
+
+@functools.lru_cache(maxsize=8)
+def _dashboard_header(school_name, page_name):
+    """Build the dashboard page header"""
+    return f"""
+    <div style="background: #f8f9fa; padding: 20px; border-radius: 10px; margin-bottom: 20px;">
+        <h1 style="margin: 0; color: #2c3e50;">{school_name} - Parent Portal</h1>
+        <p style="margin: 0; color: #7f8c8d;">{page_name}</p>
+    </div>
+    """
+
 def show_parent_login():
     """Show parent login/signup interface"""
     
     # School header
-    school_config = load_school_config()
+    school_config = _school_cfg(get_file_mtime("school_config.json"))
     school_name = school_config.get("school_name", "School Name")
     
-    st.markdown(f"""
-    <div style="text-align: center; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); border-radius: 10px; color: white; margin-bottom: 30px;">
-        <h1 style="margin: 0; font-size: 2.5rem;">🏫 {school_name}</h1>
-        <h2 style="margin: 0; font-size: 1.5rem;">Parent Portal</h2>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_login_header(school_name), unsafe_allow_html=True)
     
     col1, col2 = st.columns([1, 2])
     
@@ -472,11 +726,31 @@ def show_parent_login():
                     else:
                         st.error("⚠️ Please fill all required fields (*)")
 
+@st.fragment
+def _show_navigation():
+    """Sidebar page buttons; a click reruns only this block before switching pages"""
+    pages = {
+        "📊 Dashboard": "📊",
+        "💰 Fee Details": "💰",
+        "📋 Payment History": "📋",
+        "💳 Make Payment": "💳"
+    }
+
+    for page_name, icon in pages.items():
+        if st.button(
+            f"{icon} {page_name}",
+            key=f"nav_{page_name}",
+            use_container_width=True,
+            type="primary" if st.session_state.current_parent_page == page_name else "secondary"
+        ):
+            st.session_state.current_parent_page = page_name
+            st.rerun(scope="app")
+
 def show_parent_dashboard():
     """Show parent dashboard after login"""
     
     # School header
-    school_config = load_school_config()
+    school_config = _school_cfg(get_file_mtime("school_config.json"))
     school_name = school_config.get("school_name", "School Name")
     
     # Sidebar with collapsible design
@@ -484,14 +758,10 @@ def show_parent_dashboard():
         # Parent info section
         parent_info = get_parent_info(st.session_state.parent_email)
         
-        st.markdown(f"""
-        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 20px; border-radius: 10px; color: white; margin-bottom: 20px;">
-            <h3 style="margin: 0; font-size: 1.2rem;">👋 Welcome!</h3>
-            <p style="margin: 5px 0; font-size: 1rem;"><strong>{parent_info.get('parent_name', 'Parent')}</strong></p>
-            <p style="margin: 5px 0; font-size: 0.8rem;">{st.session_state.parent_email}</p>
-            <p style="margin: 5px 0; font-size: 0.8rem;">📱 {parent_info.get('phone', 'N/A')}</p>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(
+            _welcome_card(parent_info.get('parent_name', 'Parent'), st.session_state.parent_email, parent_info.get('phone', 'N/A')),
+            unsafe_allow_html=True
+        )
         
         # Student selection
         students = get_parent_students(st.session_state.parent_email)
@@ -517,23 +787,8 @@ def show_parent_dashboard():
             st.session_state.current_parent_page = "📊 Dashboard"
         
         # Page selection buttons
-        pages = {
-            "📊 Dashboard": "📊",
-            "💰 Fee Details": "💰", 
-            "📋 Payment History": "📋",
-            "💳 Make Payment": "💳"
-        }
-        
-        for page_name, icon in pages.items():
-            if st.button(
-                f"{icon} {page_name}", 
-                key=f"nav_{page_name}",
-                use_container_width=True,
-                type="primary" if st.session_state.current_parent_page == page_name else "secondary"
-            ):
-                st.session_state.current_parent_page = page_name
-                st.rerun()
-        
+        _show_navigation()
+
         st.divider()
         
         # Logout button
@@ -542,12 +797,7 @@ def show_parent_dashboard():
             st.rerun()
     
     # Main content area
-    st.markdown(f"""
-    <div style="background: #f8f9fa; padding: 20px; border-radius: 10px; margin-bottom: 20px;">
-        <h1 style="margin: 0; color: #2c3e50;">{school_name} - Parent Portal</h1>
-        <p style="margin: 0; color: #7f8c8d;">{st.session_state.current_parent_page}</p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_dashboard_header(school_name, st.session_state.current_parent_page), unsafe_allow_html=True)
     
     if not students:
         st.info("📝 No students are linked to your account. Please contact school administration to link your students.")
@@ -739,24 +989,17 @@ def show_fee_details_page(student_id):
     # All months display in a grid
     st.subheader("📅 Complete Monthly Status")
     
-    # Create columns for months (4 months per row)
-    months = [
-        "APRIL", "MAY", "JUNE", "JULY", "AUGUST", "SEPTEMBER",
-        "OCTOBER", "NOVEMBER", "DECEMBER", "JANUARY", "FEBRUARY", "MARCH"
-    ]
-    
-    # Create 4 columns for better layout
+    # Create 4 columns for better layout (4 months per row)
     cols = st.columns(4)
+    paid_map = fee_details['paid_months_by_name']
     
-    for i, month in enumerate(months):
+    for i, month in enumerate(ALL_MONTHS):
         col_idx = i % 4
         with cols[col_idx]:
             # Check if month is paid
-            is_paid = any(p['month'] == month for p in fee_details['paid_months'])
+            paid_month = paid_map.get(month)
             
-            if is_paid:
-                # Find paid month details
-                paid_month = next((p for p in fee_details['paid_months'] if p['month'] == month), None)
+            if paid_month:
                 st.success(f"""
                 **{month}**
                 ✅ PAID
@@ -775,8 +1018,8 @@ def show_payment_history_page(student_id):
     # Add back button at the top
     add_back_button()
     
-    df = load_data()
-    student_records = df[df['ID'] == student_id]
+    df = _load_data_indexed(get_file_mtime("fees_data.csv"))
+    student_records = _get_student_records(df, student_id)
     
     if student_records.empty:
         st.info("ℹ️ No payment history found")
@@ -799,24 +1042,15 @@ def show_payment_history_page(student_id):
     
     display_columns = ['Date', 'Month', 'Monthly Fee', 'Annual Charges', 'Admission Fee', 'Received Amount', 'Payment Method']
     available_columns = [col for col in display_columns if col in student_records.columns]
-    display_df = student_records[available_columns].copy()
-    
-    # Format dates and amounts
-    if 'Date' in display_df.columns:
-        display_df['Date'] = pd.to_datetime(display_df['Date'], errors='coerce').dt.strftime('%d-%m-%Y')
-    display_df = display_df.sort_values('Date' if 'Date' in display_df.columns else available_columns[0], ascending=False)
+    # Amounts are shown from their preformatted "Rs. ..." columns
+    source_columns = [f"{col}_fmt" if col in AMOUNT_COLUMNS else col for col in available_columns]
     
-    # Format currency display
-    def format_rs(val):
-        return f"Rs. {val:,}" if pd.notna(val) and val != 0 else "Rs. 0"
+    # Newest first, by the date parsed when the records were loaded
+    display_df = student_records.sort_values('Paid On', ascending=False)[source_columns]
+    display_df.columns = available_columns
     
     st.dataframe(
-        display_df.style.format({
-            'Monthly Fee': format_rs,
-            'Annual Charges': format_rs,
-            'Admission Fee': format_rs,
-            'Received Amount': format_rs
-        }),
+        display_df,
         use_container_width=True,
         height=400
     )
@@ -4,28 +4,276 @@
 import streamlit as st
 import json
 import os
+import threading
+import contextlib
+import numpy as np
 from datetime import datetime
-from database import format_currency
+from enum import IntEnum
+from utils import format_currency
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+# Snapshot of {student_id: [payments]}, plus an append-only log of the
+# changes made since it was written
+PARENT_PAYMENTS_HISTORY_FILE = "parent_payments_history.json"
+PARENT_PAYMENTS_LOG_FILE = "parent_payments_history.jsonl"
+# Serializes log appends and compaction across processes
+PARENT_PAYMENTS_LOCK_FILE = "parent_payments_history.lock"
+# Snapshot key holding the sequence number of the last event folded into it
+SNAPSHOT_SEQ_KEY = "_log_seq"
+# Fold the log into the snapshot once it grows past this many events
+COMPACT_AFTER_EVENTS = 10000
+# Pending payments shown per page in the "View All" list
+PENDING_PAGE_SIZE = 25
+
+class PaymentStatus(IntEnum):
+    """Verification status of a parent payment, stored as its integer value"""
+    PENDING = 0
+    VERIFIED = 1
+    REJECTED = 2
+
+# Status strings written by older versions of the history
+_STATUS_MAP = {
+    "pending_verification": PaymentStatus.PENDING,
+    "verified": PaymentStatus.VERIFIED,
+    "rejected": PaymentStatus.REJECTED
+}
+
+# Replayed history shared by every session, rebuilt only when the files change
+_CACHE = {"mtime": None, "data": None, "txn_index": {}, "stats": None, "columns": None, "log_events": 0, "seq": 0}
+_CACHE_LOCK = threading.RLock()
+
+def _empty_stats():
+    """Payment statistics for an empty history"""
+    return {
+        'total_pending': 0,
+        'total_verified': 0,
+        'total_rejected': 0,
+        'pending_amount': 0,
+        'verified_amount': 0
+    }
+
+def _json_loads(data):
+    """Parse JSON text or bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps(obj, indent=False):
+    """Serialize an object to JSON bytes, compact unless indent is set, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(obj, indent=2).encode('utf-8')
+    return json.dumps(obj, separators=(",", ":")).encode('utf-8')
+
+@contextlib.contextmanager
+def _history_lock(shared=False):
+    """Hold the history file lock: shared to replay, exclusive to append or compact"""
+    with open(PARENT_PAYMENTS_LOCK_FILE, 'ab') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)  # Released when the file is closed
+        yield
+
+def _files_mtime():
+    """Get the (snapshot, log) modification times, None for a missing file"""
+    mtimes = []
+    for path in (PARENT_PAYMENTS_HISTORY_FILE, PARENT_PAYMENTS_LOG_FILE):
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+def _status_of(payment):
+    """Get a payment's status, converting legacy status strings to PaymentStatus"""
+    status = payment.get('status')
+    return _STATUS_MAP.get(status, status)
+
+def _tally(stats, payment, sign=1):
+    """Add (or with sign=-1, remove) a payment's contribution to the statistics"""
+    status = _status_of(payment)
+    amount = payment.get('amount', 0)
+    
+    if status == PaymentStatus.PENDING:
+        stats['total_pending'] += sign
+        stats['pending_amount'] += sign * amount
+    elif status == PaymentStatus.VERIFIED:
+        stats['total_verified'] += sign
+        stats['verified_amount'] += sign * amount
+    elif status == PaymentStatus.REJECTED:
+        stats['total_rejected'] += sign
+
+def _index_payment(state, student_id, i, payment):
+    """Add a payment to the transaction lookup and the statistics"""
+    # The first payment with a transaction ID wins, as with a linear search
+    state["txn_index"].setdefault(payment.get('transaction_id'), (student_id, i))
+    _tally(state["stats"], payment)
+
+def _apply_event(state, event):
+    """Apply one logged change to the history, its transaction index and statistics"""
+    payments = state["data"]
+    if event['op'] == 'add':
+        payment = event['payment']
+        student_payments = payments.setdefault(payment['student_id'], [])
+        student_payments.append(payment)
+        _index_payment(state, payment['student_id'], len(student_payments) - 1, payment)
+    elif event['transaction_id'] in state["txn_index"]:
+        student_id, i = state["txn_index"][event['transaction_id']]
+        payment = payments[student_id][i]
+        _tally(state["stats"], payment, -1)
+        payment.update(event['changes'])
+        _tally(state["stats"], payment)
+
+def _replay_log():
+    """Rebuild the history, transaction index and statistics from the snapshot and the event log"""
+    payments = {}
+    if os.path.exists(PARENT_PAYMENTS_HISTORY_FILE):
+        with open(PARENT_PAYMENTS_HISTORY_FILE, 'rb') as f:
+            payments = _json_loads(f.read())
+    snapshot_seq = payments.pop(SNAPSHOT_SEQ_KEY, 0)
+    
+    state = {
+        "data": payments, "txn_index": {}, "stats": _empty_stats(), "columns": None,
+        "log_events": 0, "seq": snapshot_seq
+    }
+    for student_id, student_payments in payments.items():
+        for i, payment in enumerate(student_payments):
+            _index_payment(state, student_id, i, payment)
+    
+    if os.path.exists(PARENT_PAYMENTS_LOG_FILE):
+        with open(PARENT_PAYMENTS_LOG_FILE, 'rb') as f:
+            for line in f:
+                try:
+                    event = _json_loads(line)
+                except ValueError:
+                    continue  # Partially written line
+                state["log_events"] += 1
+                # Events a compaction folded in before it could truncate the
+                # log are already in the snapshot; events without a sequence
+                # number predate it and were never compacted
+                seq = event.get('seq')
+                if seq is not None:
+                    if seq <= snapshot_seq:
+                        continue
+                    state["seq"] = seq
+                _apply_event(state, event)
+    return state
+
+def _load_payments(locked=False):
+    """Load the {student_id: [payments]} history, reusing the cached copy while the files are unchanged
+
+    locked is set by callers already holding the exclusive history lock.
+    """
+    with _CACHE_LOCK:
+        mtime = _files_mtime()
+        if _CACHE["mtime"] != mtime:
+            with contextlib.nullcontext() if locked else _history_lock(shared=True):
+                mtime = _files_mtime()
+                _CACHE.update(_replay_log())
+            _CACHE["mtime"] = mtime
+        return _CACHE["data"]
+
+def _compact(payments, log_file):
+    """Write the replayed history as the new snapshot and empty the log
+
+    The snapshot records the last folded event's sequence number, so a crash
+    between replacing it and truncating the log can't apply those events twice.
+    Called with the history lock held.
+    """
+    tmp_file = PARENT_PAYMENTS_HISTORY_FILE + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(_json_dumps({**payments, SNAPSHOT_SEQ_KEY: _CACHE["seq"]}, indent=True))
+    os.replace(tmp_file, PARENT_PAYMENTS_HISTORY_FILE)
+    log_file.truncate(0)
+    _CACHE["log_events"] = 0
+
+def _append_events(events):
+    """Log changes, apply them to the cached history and compact when the log gets long"""
+    with _CACHE_LOCK, _history_lock():
+        # Replays anything another process logged, so sequence numbers stay in order
+        payments = _load_payments(locked=True)
+        for event in events:
+            _CACHE["seq"] += 1
+            event["seq"] = _CACHE["seq"]
+            _apply_event(_CACHE, event)
+        _CACHE["columns"] = None
+        
+        with open(PARENT_PAYMENTS_LOG_FILE, 'ab') as f:
+            f.write(b"".join(_json_dumps(event) + b"\n" for event in events))
+            f.flush()
+            _CACHE["log_events"] += len(events)
+            
+            if _CACHE["log_events"] >= COMPACT_AFTER_EVENTS:
+                _compact(payments, f)
+        _CACHE["mtime"] = _files_mtime()
+
+def _status_event(transaction_id, status):
+    """Build the logged change that verifies or rejects a payment"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    user = st.session_state.get('current_user', 'Admin')
+    
+    if status == PaymentStatus.VERIFIED:
+        changes = {"status": int(PaymentStatus.VERIFIED), "verified_at": now, "verified_by": user}
+        op = "verify"
+    else:
+        changes = {
+            "status": int(PaymentStatus.REJECTED),
+            "rejected_at": now,
+            "rejected_by": user,
+            "rejection_reason": "Manual rejection by admin"
+        }
+        op = "reject"
+    return {"op": op, "transaction_id": transaction_id, "changes": changes}
+
+def add_parent_payment(payment_data):
+    """Append a payment to its student's history"""
+    _append_events([{"op": "add", "payment": payment_data}])
+
+def _columns():
+    """Get the history as parallel column arrays for filtering and sorting
+
+    Built from the cached history on first use after a change; "rows" keeps
+    the payment dicts in the same order for rendering.
+    """
+    with _CACHE_LOCK:
+        payments = _load_payments()
+        if _CACHE["columns"] is None:
+            rows = [payment for student_payments in payments.values() for payment in student_payments]
+            statuses = (_status_of(payment) for payment in rows)
+            _CACHE["columns"] = {
+                "rows": rows,
+                "status": np.fromiter(
+                    (status if isinstance(status, int) else -1 for status in statuses),
+                    dtype=np.int8,
+                    count=len(rows)
+                ),
+                "date": np.array([payment.get('payment_date', '') for payment in rows], dtype=str)
+            }
+        return _CACHE["columns"]
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def _pending_payments_cached(mtime):
+    """Filter and sort the pending payments once per (snapshot, log) modification"""
+    columns = _columns()
+    pending_rows = np.flatnonzero(columns["status"] == PaymentStatus.PENDING)
+    
+    # Sort by date (newest first); sorting the reversed dates and flipping
+    # the result keeps payments with the same date in their original order
+    dates = columns["date"][pending_rows]
+    order = len(dates) - 1 - np.argsort(dates[::-1], kind='stable')[::-1]
+    return [columns["rows"][i] for i in pending_rows[order]]
 
 def get_pending_parent_payments():
     """Get all pending parent payments for notifications"""
     try:
-        parent_payments_file = "parent_payments_history.json"
-        if not os.path.exists(parent_payments_file):
-            return []
-        
-        with open(parent_payments_file, 'r') as f:
-            payments = json.load(f)
-        
-        pending_payments = []
-        for student_id, student_payments in payments.items():
-            for payment in student_payments:
-                if payment.get('status') == 'pending_verification':
-                    pending_payments.append(payment)
-        
-        # Sort by date (newest first)
-        pending_payments.sort(key=lambda x: x.get('payment_date', ''), reverse=True)
-        return pending_payments
+        return _pending_payments_cached(_files_mtime())
     except Exception as e:
         print(f"Error getting pending payments: {e}")
         return []
@@ -33,25 +281,11 @@ def get_pending_parent_payments():
 def verify_parent_payment(payment_data):
     """Verify a parent payment"""
     try:
-        parent_payments_file = "parent_payments_history.json"
-        
-        if not os.path.exists(parent_payments_file):
+        if not _load_payments():
             return False
-            
-        with open(parent_payments_file, 'r') as f:
-            payments = json.load(f)
         
         # Update payment status
-        for student_id, student_payments in payments.items():
-            for i, payment in enumerate(student_payments):
-                if payment.get('transaction_id') == payment_data.get('transaction_id'):
-                    payments[student_id][i]['status'] = 'verified'
-                    payments[student_id][i]['verified_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    payments[student_id][i]['verified_by'] = st.session_state.get('current_user', 'Admin')
-                    break
-        
-        with open(parent_payments_file, 'w') as f:
-            json.dump(payments, f, indent=4)
+        _append_events([_status_event(payment_data.get('transaction_id'), PaymentStatus.VERIFIED)])
         
         return True
     except Exception as e:
@@ -61,32 +295,31 @@ def verify_parent_payment(payment_data):
 def reject_parent_payment(payment_data):
     """Reject a parent payment"""
     try:
-        parent_payments_file = "parent_payments_history.json"
-        
-        if not os.path.exists(parent_payments_file):
+        if not _load_payments():
             return False
-            
-        with open(parent_payments_file, 'r') as f:
-            payments = json.load(f)
         
         # Update payment status to rejected
-        for student_id, student_payments in payments.items():
-            for i, payment in enumerate(student_payments):
-                if payment.get('transaction_id') == payment_data.get('transaction_id'):
-                    payments[student_id][i]['status'] = 'rejected'
-                    payments[student_id][i]['rejected_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    payments[student_id][i]['rejected_by'] = st.session_state.get('current_user', 'Admin')
-                    payments[student_id][i]['rejection_reason'] = "Manual rejection by admin"
-                    break
-        
-        with open(parent_payments_file, 'w') as f:
-            json.dump(payments, f, indent=4)
+        _append_events([_status_event(payment_data.get('transaction_id'), PaymentStatus.REJECTED)])
         
         return True
     except Exception as e:
         st.error(f"Rejection error: {str(e)}")
         return False
 
+def bulk_update_statuses(updates):
+    """Verify or reject several payments at once from (transaction_id, status) pairs,
+    where status is PaymentStatus.VERIFIED or PaymentStatus.REJECTED"""
+    try:
+        if not updates or not _load_payments():
+            return False
+        
+        _append_events([_status_event(transaction_id, status) for transaction_id, status in updates])
+        
+        return True
+    except Exception as e:
+        st.error(f"Bulk update error: {str(e)}")
+        return False
+
 def show_parent_payment_notifications():
     """Show parent payment notifications in admin dashboard"""
     try:
@@ -119,8 +352,7 @@ def show_parent_payment_notifications():
                         
                         with col3:
                             st.write(f"**Date:** {payment.get('payment_date', 'N/A')}")
-                            status = payment.get('status', 'pending')
-                            if status == 'pending_verification':
+                            if _status_of(payment) == PaymentStatus.PENDING:
                                 st.error("⏳ Pending")
                         
                         with col4:
@@ -154,13 +386,23 @@ def show_parent_payment_notifications():
             if st.session_state.get('show_all_pending', False):
                 st.subheader("📋 All Pending Parent Payments")
                 
-                for payment in pending_payments:
+                # Render one page of payments at a time
+                page_count = (len(pending_payments) + PENDING_PAGE_SIZE - 1) // PENDING_PAGE_SIZE
+                page = min(st.session_state.get('pending_page', 0), page_count - 1)
+                start = page * PENDING_PAGE_SIZE
+                page_payments = pending_payments[start:start + PENDING_PAGE_SIZE]
+                st.caption(f"Showing {start + 1}-{start + len(page_payments)} of {len(pending_payments)}")
+                
+                selected = []
+                for payment in page_payments:
                     with st.container():
                         st.markdown("---")
                         
                         col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
                         
                         with col1:
+                            if st.checkbox("Select", key=f"select_{payment.get('transaction_id')}"):
+                                selected.append(payment.get('transaction_id'))
                             st.write(f"**{payment.get('student_name', 'N/A')}**")
                             st.write(f"*Student ID:* {payment.get('student_id', 'N/A')}")
                             st.write(f"*Transaction:* `{payment.get('transaction_id', 'N/A')}`")
@@ -188,8 +430,43 @@ def show_parent_payment_notifications():
                                         st.warning(f"❌ Rejected {payment.get('student_name')}")
                                         st.rerun()
                 
+                # Apply the same action to every selected payment in one write
+                if selected:
+                    st.markdown("---")
+                    bulk_col1, bulk_col2 = st.columns(2)
+                    
+                    with bulk_col1:
+                        if st.button(f"✅ Verify Selected ({len(selected)})", key="verify_selected", use_container_width=True):
+                            if bulk_update_statuses([(txn, PaymentStatus.VERIFIED) for txn in selected]):
+                                st.success(f"✅ Verified {len(selected)} payments!")
+                                st.rerun()
+                    
+                    with bulk_col2:
+                        if st.button(f"❌ Reject Selected ({len(selected)})", key="reject_selected", use_container_width=True):
+                            if bulk_update_statuses([(txn, PaymentStatus.REJECTED) for txn in selected]):
+                                st.warning(f"❌ Rejected {len(selected)} payments")
+                                st.rerun()
+                
+                if page_count > 1:
+                    st.markdown("---")
+                    prev_col, page_col, next_col = st.columns([1, 2, 1])
+                    
+                    with prev_col:
+                        if st.button("◀ Previous", key="pending_prev", disabled=page == 0, use_container_width=True):
+                            st.session_state.pending_page = page - 1
+                            st.rerun()
+                    
+                    with page_col:
+                        st.write(f"Page {page + 1} of {page_count}")
+                    
+                    with next_col:
+                        if st.button("Next ▶", key="pending_next", disabled=page >= page_count - 1, use_container_width=True):
+                            st.session_state.pending_page = page + 1
+                            st.rerun()
+                
                 if st.button("⬅️ Back to Summary", key="back_to_summary"):
                     st.session_state.show_all_pending = False
+                    st.session_state.pending_page = 0
                     st.rerun()
         
         else:
@@ -201,51 +478,12 @@ def show_parent_payment_notifications():
 def get_payment_stats():
     """Get payment statistics for dashboard"""
     try:
-        parent_payments_file = "parent_payments_history.json"
-        if not os.path.exists(parent_payments_file):
-            return {
-                'total_pending': 0,
-                'total_verified': 0,
-                'total_rejected': 0,
-                'pending_amount': 0,
-                'verified_amount': 0
-            }
-        
-        with open(parent_payments_file, 'r') as f:
-            payments = json.load(f)
-        
-        stats = {
-            'total_pending': 0,
-            'total_verified': 0,
-            'total_rejected': 0,
-            'pending_amount': 0,
-            'verified_amount': 0
-        }
-        
-        for student_id, student_payments in payments.items():
-            for payment in student_payments:
-                status = payment.get('status', 'pending')
-                amount = payment.get('amount', 0)
-                
-                if status == 'pending_verification':
-                    stats['total_pending'] += 1
-                    stats['pending_amount'] += amount
-                elif status == 'verified':
-                    stats['total_verified'] += 1
-                    stats['verified_amount'] += amount
-                elif status == 'rejected':
-                    stats['total_rejected'] += 1
-        
-        return stats
+        with _CACHE_LOCK:
+            _load_payments()
+            return dict(_CACHE["stats"])
         
     except Exception as e:
         print(f"Error getting payment stats: {e}")
-        return {
-            'total_pending': 0,
-            'total_verified': 0,
-            'total_rejected': 0,
-            'pending_amount': 0,
-            'verified_amount': 0
-        }
+        return _empty_stats()
 
-# [file content end]
\ No newline at end of file
+# [file content end]
@@ -1,10 +1,64 @@
 # type:ignore
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import json
 import os
-from database import load_data, update_data
+from database import load_data, update_data, get_file_mtime
+
+# Months of the academic year, in order, and each month's position in it
+_MONTHS = ("APRIL", "MAY", "JUNE", "JULY", "AUGUST", "SEPTEMBER",
+           "OCTOBER", "NOVEMBER", "DECEMBER", "JANUARY", "FEBRUARY", "MARCH")
+_MONTH_IDX = {month: i for i, month in enumerate(_MONTHS)}
+_AMOUNT_COLUMNS = ('Monthly Fee', 'Annual Charges', 'Admission Fee', 'Received Amount')
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def _cached_load_data(mtime_ns):
+    """Load fees_data.csv indexed by student ID, once per modification"""
+    df = load_data()
+    if 'ID' not in df.columns:
+        return df
+    # Stable sort keeps each student's rows in file (payment) order
+    return df.set_index('ID', drop=False).sort_index(kind='stable')
+
+def _load_fees_data():
+    """Get the fee records from the cached loader"""
+    return _cached_load_data(get_file_mtime("fees_data.csv"))
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _cached_year_data(mtime_ns, academic_year):
+    """Get one academic year's fee records, indexed by student ID, once per modification"""
+    df = _cached_load_data(mtime_ns)
+    if 'Academic Year' not in df.columns:
+        return df
+    return df[df['Academic Year'] == academic_year]
+
+def _load_year_data(academic_year):
+    """Get an academic year's fee records from the cached loader"""
+    return _cached_year_data(get_file_mtime("fees_data.csv"), academic_year)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _paid_months(student_id, academic_year, mtime_ns):
+    """Get a student's paid months for an academic year, as a list in payment order and as a set"""
+    yearly_records = _get_student_records(_cached_year_data(mtime_ns, academic_year), student_id)
+    paid_months = yearly_records.loc[yearly_records['Monthly Fee'] > 0, 'Month'].unique().tolist()
+    return paid_months, frozenset(paid_months)
+
+def _get_paid_months(student_id, academic_year):
+    """Get a student's paid months from the cached helper"""
+    return _paid_months(student_id, academic_year, get_file_mtime("fees_data.csv"))
+
+def _get_student_records(df, student_id):
+    """Get a student's rows from the ID-indexed fee records"""
+    if 'ID' in df.columns and student_id in df.index:
+        # List form keeps a DataFrame even when there is a single row
+        return df.loc[[student_id]]
+    return df.iloc[0:0]
+
+def _fee_totals(records):
+    """Sum each amount column on its own, so integer columns keep integer totals"""
+    return {col: records[col].sum() for col in _AMOUNT_COLUMNS}
 
 def payment_verification_page():
     """Payment verification page for parents to verify and track payments"""
@@ -24,12 +78,12 @@ def verify_payment_status(student_id):
     
     st.subheader("🔍 Payment Status Verification")
     
-    df = load_data()
+    df = _load_fees_data()
     if df.empty:
         st.error("No payment records found")
         return
     
-    student_records = df[df['ID'] == student_id]
+    student_records = _get_student_records(df, student_id)
     
     if student_records.empty:
         st.error("No records found for this Student ID")
@@ -46,7 +100,7 @@ def verify_payment_status(student_id):
     academic_year = f"{current_year}-{current_year+1}"
     
     # Calculate payment summary
-    yearly_records = student_records[student_records['Academic Year'] == academic_year]
+    yearly_records = _get_student_records(_load_year_data(academic_year), student_id)
     
     if yearly_records.empty:
         st.warning("No payments found for current academic year")
@@ -54,13 +108,9 @@ def verify_payment_status(student_id):
     
     # Monthly fee analysis
     monthly_payments = yearly_records[yearly_records['Monthly Fee'] > 0]
-    paid_months = monthly_payments['Month'].unique().tolist()
-    
-    # All months in academic year
-    all_months = ["APRIL", "MAY", "JUNE", "JULY", "AUGUST", "SEPTEMBER",
-                 "OCTOBER", "NOVEMBER", "DECEMBER", "JANUARY", "FEBRUARY", "MARCH"]
+    paid_months, paid_set = _get_paid_months(student_id, academic_year)
     
-    unpaid_months = [month for month in all_months if month not in paid_months]
+    unpaid_months = [month for month in _MONTHS if month not in paid_set]
     
     # Annual and admission fees
     annual_paid = yearly_records['Annual Charges'].sum() > 0
@@ -87,16 +137,9 @@ def verify_payment_status(student_id):
     st.subheader("📅 Payment Timeline")
     
     if not monthly_payments.empty:
-        timeline_data = []
-        for _, payment in monthly_payments.iterrows():
-            timeline_data.append({
-                "Month": payment['Month'],
-                "Amount": payment['Monthly Fee'],
-                "Date": payment['Date'],
-                "Method": payment['Payment Method']
-            })
-        
-        timeline_df = pd.DataFrame(timeline_data)
+        timeline_df = monthly_payments[['Month', 'Monthly Fee', 'Date', 'Payment Method']].rename(
+            columns={'Monthly Fee': 'Amount', 'Payment Method': 'Method'}
+        ).reset_index(drop=True)
         st.dataframe(timeline_df, use_container_width=True)
     else:
         st.info("No monthly payments recorded for current academic year")
@@ -106,8 +149,8 @@ def show_payment_tracking(student_id):
     
     st.subheader("💰 Payment Tracking")
     
-    df = load_data()
-    student_records = df[df['ID'] == student_id]
+    df = _load_fees_data()
+    student_records = _get_student_records(df, student_id)
     
     if student_records.empty:
         return
@@ -115,16 +158,17 @@ def show_payment_tracking(student_id):
     # Filter current academic year
     current_year = datetime.now().year
     academic_year = f"{current_year}-{current_year+1}"
-    yearly_records = student_records[student_records['Academic Year'] == academic_year]
+    yearly_records = _get_student_records(_load_year_data(academic_year), student_id)
     
     if yearly_records.empty:
         return
     
     # Total calculations
-    total_monthly = yearly_records['Monthly Fee'].sum()
-    total_annual = yearly_records['Annual Charges'].sum()
-    total_admission = yearly_records['Admission Fee'].sum()
-    total_received = yearly_records['Received Amount'].sum()
+    totals = _fee_totals(yearly_records)
+    total_monthly = totals['Monthly Fee']
+    total_annual = totals['Annual Charges']
+    total_admission = totals['Admission Fee']
+    total_received = totals['Received Amount']
     
     # Display in columns
     col1, col2, col3, col4 = st.columns(4)
@@ -142,7 +186,8 @@ def show_payment_tracking(student_id):
     
     # Format currency
     for col in ['Monthly Fee', 'Annual Charges', 'Admission Fee', 'Received Amount']:
-        recent_payments[col] = recent_payments[col].apply(lambda x: f"₹{x:,}" if x > 0 else "-")
+        values = recent_payments[col]
+        recent_payments[col] = np.where(values > 0, values.map("₹{:,}".format), "-")
     
     st.dataframe(recent_payments.sort_values('Date', ascending=False), 
                 use_container_width=True, hide_index=True)
@@ -152,8 +197,8 @@ def show_upcoming_payments(student_id):
     
     st.subheader("📈 Upcoming Payment Schedule")
     
-    df = load_data()
-    student_records = df[df['ID'] == student_id]
+    df = _load_fees_data()
+    student_records = _get_student_records(df, student_id)
     
     if student_records.empty:
         return
@@ -164,22 +209,19 @@ def show_upcoming_payments(student_id):
     academic_year = f"{current_year}-{current_year+1}"
     
     # Paid months in current academic year
-    yearly_records = student_records[student_records['Academic Year'] == academic_year]
-    paid_months = yearly_records[yearly_records['Monthly Fee'] > 0]['Month'].unique().tolist()
+    paid_months, paid_set = _get_paid_months(student_id, academic_year)
     
-    # Month order for academic year
-    month_order = ["APRIL", "MAY", "JUNE", "JULY", "AUGUST", "SEPTEMBER",
-                  "OCTOBER", "NOVEMBER", "DECEMBER", "JANUARY", "FEBRUARY", "MARCH"]
+    current_month_index = _MONTH_IDX[current_month]
     
     # Create payment schedule
     schedule_data = []
-    for month in month_order:
-        status = "✅ Paid" if month in paid_months else "❌ Unpaid"
+    for month_index, month in enumerate(_MONTHS):
+        status = "✅ Paid" if month in paid_set else "❌ Unpaid"
         
         # Highlight current and upcoming months
         if month == current_month:
             status = "🔵 Current Month"
-        elif month not in paid_months and month_order.index(month) > month_order.index(current_month):
+        elif month not in paid_set and month_index > current_month_index:
             status = "🟡 Upcoming"
         
         schedule_data.append({
@@ -195,14 +237,12 @@ def show_upcoming_payments(student_id):
     # Payment recommendations
     st.subheader("💡 Payment Recommendations")
     
-    unpaid_months = [month for month in month_order if month not in paid_months]
-    current_month_index = month_order.index(current_month)
-    
     overdue_months = []
     upcoming_months = []
     
-    for month in unpaid_months:
-        month_index = month_order.index(month)
+    for month_index, month in enumerate(_MONTHS):
+        if month in paid_set:
+            continue
         if month_index <= current_month_index:
             overdue_months.append(month)
         else:
@@ -221,8 +261,8 @@ def show_upcoming_payments(student_id):
 def check_payment_eligibility(student_id, month, fee_type):
     """Check if a payment can be made for specific month/fee type"""
     
-    df = load_data()
-    student_records = df[df['ID'] == student_id]
+    df = _load_fees_data()
+    student_records = _get_student_records(df, student_id)
     
     if student_records.empty:
         return True  # New student
@@ -230,7 +270,7 @@ def check_payment_eligibility(student_id, month, fee_type):
     current_year = datetime.now().year
     academic_year = f"{current_year}-{current_year+1}"
     
-    yearly_records = student_records[student_records['Academic Year'] == academic_year]
+    yearly_records = _get_student_records(_load_year_data(academic_year), student_id)
     
     if fee_type == "monthly":
         # Check if month already paid
@@ -255,30 +295,27 @@ def check_payment_eligibility(student_id, month, fee_type):
 def get_payment_summary(student_id):
     """Get comprehensive payment summary for student"""
     
-    df = load_data()
-    student_records = df[df['ID'] == student_id]
+    df = _load_fees_data()
+    student_records = _get_student_records(df, student_id)
     
     if student_records.empty:
         return None
     
     current_year = datetime.now().year
     academic_year = f"{current_year}-{current_year+1}"
-    yearly_records = student_records[student_records['Academic Year'] == academic_year]
+    yearly_records = _get_student_records(_load_year_data(academic_year), student_id)
     
     # Calculate totals
-    total_monthly = yearly_records['Monthly Fee'].sum()
-    total_annual = yearly_records['Annual Charges'].sum()
-    total_admission = yearly_records['Admission Fee'].sum()
-    total_received = yearly_records['Received Amount'].sum()
+    totals = _fee_totals(yearly_records)
+    total_monthly = totals['Monthly Fee']
+    total_annual = totals['Annual Charges']
+    total_admission = totals['Admission Fee']
+    total_received = totals['Received Amount']
     
     # Monthly breakdown
-    paid_months = yearly_records[yearly_records['Monthly Fee'] > 0]['Month'].unique().tolist()
-    
-    # All months in academic year
-    all_months = ["APRIL", "MAY", "JUNE", "JULY", "AUGUST", "SEPTEMBER",
-                 "OCTOBER", "NOVEMBER", "DECEMBER", "JANUARY", "FEBRUARY", "MARCH"]
+    paid_months, paid_set = _get_paid_months(student_id, academic_year)
     
-    unpaid_months = [month for month in all_months if month not in paid_months]
+    unpaid_months = [month for month in _MONTHS if month not in paid_set]
     
     return {
         "student_name": student_records.iloc[0]['Student Name'],
@@ -5,6 +5,12 @@ import json
 import os
 from datetime import datetime
 
+@st.cache_data(max_entries=1, show_spinner=False)
+def _cached_student_details(mtime_ns):
+    """Load student details once per student_details.json modification"""
+    from database import load_student_details
+    return load_student_details()
+
 class RealPaymentSystem:
     def __init__(self):
         self.payments_file = "parent_payments.json"
@@ -19,10 +25,10 @@ class RealPaymentSystem:
     def handle_parent_payment(self, student_id, student_name, amount, payment_method, transaction_id):
         """Handle payment from parent and record in admin system"""
         try:
-            from database import save_to_csv, load_student_details
+            from database import save_to_csv, get_file_mtime
             
             # Load student details
-            student_details = load_student_details()
+            student_details = _cached_student_details(get_file_mtime("student_details.json"))
             student_info = student_details.get(student_id, {})
             
             # Create payment record
@@ -63,16 +69,7 @@ class RealPaymentSystem:
     def _save_parent_payment_record(self, student_id, student_name, amount, payment_method, transaction_id):
         """Save parent payment record to separate file"""
         try:
-            parent_payments_file = "parent_payments_history.json"
-            
-            if os.path.exists(parent_payments_file):
-                with open(parent_payments_file, 'r') as f:
-                    payments = json.load(f)
-            else:
-                payments = {}
-            
-            if student_id not in payments:
-                payments[student_id] = []
+            from payment_notifications import add_parent_payment, PaymentStatus
             
             payment_data = {
                 "student_id": student_id,
@@ -81,13 +78,10 @@ class RealPaymentSystem:
                 "payment_method": payment_method,
                 "transaction_id": transaction_id,
                 "payment_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "status": "pending_verification"
+                "status": int(PaymentStatus.PENDING)
             }
             
-            payments[student_id].append(payment_data)
-            
-            with open(parent_payments_file, 'w') as f:
-                json.dump(payments, f, indent=4)
+            add_parent_payment(payment_data)
             
             return True
         except Exception as e: